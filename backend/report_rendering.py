@@ -0,0 +1,81 @@
+"""Report rendering for the report worker processes (see ReportJobQueue in server.py).
+
+The pool uses spawn, so each worker imports the module holding the function it
+runs. Keep this module free of side effects and of imports from server.py: no
+database clients, threads, env configuration or app setup.
+"""
+import io
+import zipfile
+from typing import Any, Dict
+
+import pandas as pd
+
+
+def render_progress_report(inputs: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """Stakeholder progress report tables from cohort analytics payloads"""
+    cohorts = inputs["cohorts"]
+    weekly = []
+    for cohort in cohorts:
+        frame = pd.DataFrame(cohort["weekly_performance"])
+        frame = frame.merge(pd.DataFrame(cohort["sentiment_analysis"]["sentiment_timeline"]), on="week", how="left")
+        frame = frame.merge(pd.DataFrame(cohort["trainer_interactions"]), on="week", how="left")
+        frame.insert(0, "cohort", cohort["cohort_name"])
+        weekly.append(frame)
+    weekly = pd.concat(weekly, ignore_index=True)
+    weekly["lessons_per_active"] = (weekly["completed_lessons"] / weekly["active"]).round(2)
+    weekly["active_change"] = weekly.groupby("cohort")["active"].diff().fillna(0).astype(int)
+
+    funnel = pd.DataFrame([
+        {"cohort": cohort["cohort_name"], "stage": stage["stage"], "count": stage["count"]}
+        for cohort in cohorts for stage in cohort["learner_journey"]
+    ])
+    previous = funnel.groupby("cohort", sort=False)["count"].shift()
+    funnel["stage_conversion_pct"] = (100 * funnel["count"] / previous).round(1)
+    funnel["overall_conversion_pct"] = (
+        100 * funnel["count"] / funnel.groupby("cohort", sort=False)["count"].transform("first")
+    ).round(1)
+
+    columns = {cohort["cohort_id"]: cohort["cohort_name"] for cohort in cohorts}
+    comparison = inputs["comparison"]
+    positions = [i for i, cohort in enumerate(comparison["cohorts"]) if cohort["cohort_id"] in columns]
+    comparison_table = pd.DataFrame([
+        {"metric": row["label"], **{comparison["cohorts"][i]["cohort_name"]: row["values"][i] for i in positions}}
+        for row in comparison["rows"]
+    ])
+
+    at_risk = pd.DataFrame([
+        {"cohort": cohort["cohort_name"], **learner}
+        for cohort in cohorts for learner in cohort["at_risk_learners"]
+    ])
+    return {"weekly.csv": weekly, "funnel.csv": funnel, "comparison.csv": comparison_table, "at_risk.csv": at_risk}
+
+
+def render_huddle_export(inputs: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """Weekly huddle export tables"""
+    huddle = inputs["huddle"]
+    summary = pd.DataFrame([{
+        "week": huddle["week"],
+        "date": huddle["date"],
+        **huddle["metrics"],
+        "key_insight": huddle["key_insight"]["description"],
+        "hypothesis": huddle["root_cause"]["description"]
+    }])
+    return {
+        "summary.csv": summary,
+        "recommendations.csv": pd.DataFrame(huddle["recommendations"]),
+        "decisions.csv": pd.DataFrame(huddle["decisions"]),
+        "highlights.csv": pd.DataFrame(huddle["weekly_highlights"])
+    }
+
+
+REPORT_RENDERERS = {"progress": render_progress_report, "huddle": render_huddle_export}
+
+
+def render_report(kind: str, inputs: Dict[str, Any]) -> bytes:
+    """Runs in a report worker process: a zip bundle with one CSV per table"""
+    tables = REPORT_RENDERERS[kind](inputs)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        for name, frame in tables.items():
+            bundle.writestr(name, frame.to_csv(index=False))
+    return buffer.getvalue()
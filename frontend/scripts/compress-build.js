@@ -0,0 +1,62 @@
+// compress-build.js
+// Writes .gz and .br siblings for the text assets in build/, so a server can
+// pick a precompressed variant per request instead of compressing on the fly.
+
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+
+const BUILD_DIR = path.resolve(__dirname, '..', 'build');
+const COMPRESSIBLE = new Set(['.html', '.js', '.css', '.json', '.map', '.svg', '.txt', '.ico', '.webmanifest']);
+const MIN_BYTES = 1024;
+
+function* walk(dir) {
+  for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+    const fullPath = path.join(dir, entry.name);
+    if (entry.isDirectory()) {
+      yield* walk(fullPath);
+    } else {
+      yield fullPath;
+    }
+  }
+}
+
+function compressBuild() {
+  if (!fs.existsSync(BUILD_DIR)) {
+    console.warn(`[Compress] ${BUILD_DIR} not found, nothing to compress`);
+    return;
+  }
+
+  let files = 0;
+  let originalBytes = 0;
+  let brotliBytes = 0;
+  for (const file of walk(BUILD_DIR)) {
+    if (!COMPRESSIBLE.has(path.extname(file))) continue;
+    const source = fs.readFileSync(file);
+    if (source.length < MIN_BYTES) continue;
+
+    const variants = {
+      '.gz': zlib.gzipSync(source, { level: zlib.constants.Z_BEST_COMPRESSION }),
+      '.br': zlib.brotliCompressSync(source, {
+        params: {
+          [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+          [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+          [zlib.constants.BROTLI_PARAM_SIZE_HINT]: source.length,
+        },
+      }),
+    };
+    for (const [suffix, compressed] of Object.entries(variants)) {
+      // A variant that doesn't shrink the file is not worth serving
+      if (compressed.length < source.length) {
+        fs.writeFileSync(file + suffix, compressed);
+      }
+    }
+    files += 1;
+    originalBytes += source.length;
+    brotliBytes += Math.min(variants['.br'].length, source.length);
+  }
+
+  console.log(`[Compress] ${files} files: ${(originalBytes / 1024).toFixed(0)} KiB -> ${(brotliBytes / 1024).toFixed(0)} KiB brotli`);
+}
+
+compressBuild();
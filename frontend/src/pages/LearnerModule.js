@@ -22,7 +22,10 @@ const LearnerModule = () => {
 
   const fetchModule = async () => {
     try {
-      const response = await axios.get(`${API}/learners/module/${moduleId}`);
+      // With the learner session, resource URLs come back as signed download links
+      const response = await axios.get(`${API}/learners/module/${moduleId}`, {
+        headers: { "X-Learner-Session": localStorage.getItem("learner_session") }
+      });
       setModule(response.data);
     } catch (error) {
       console.error("Module error:", error);
@@ -181,19 +184,36 @@ const LearnerModule = () => {
               </CardHeader>
               <CardContent>
                 <div className="space-y-3">
-                  {module?.resources?.map((resource, index) => (
-                    <div
-                      key={index}
-                      className="flex items-center gap-3 p-3 rounded-lg border border-slate-200 hover:bg-slate-50 transition-all cursor-pointer"
-                      data-testid={`resource-${index}`}
-                    >
-                      <Download size={18} className="text-blue-600" />
-                      <div className="flex-1">
-                        <p className="text-sm font-medium text-slate-800">{resource.title}</p>
-                        <p className="text-xs text-slate-600">{resource.type} - {resource.size}</p>
+                  {module?.resources?.map((resource, index) => {
+                    const content = (
+                      <>
+                        <Download size={18} className="text-blue-600" />
+                        <div className="flex-1">
+                          <p className="text-sm font-medium text-slate-800">{resource.title}</p>
+                          <p className="text-xs text-slate-600">{resource.type} - {resource.size}</p>
+                        </div>
+                      </>
+                    );
+                    const className = "flex items-center gap-3 p-3 rounded-lg border border-slate-200 hover:bg-slate-50 transition-all";
+                    // A plain link: the browser's own downloader streams the file and can resume it
+                    return resource.url ? (
+                      <a
+                        key={index}
+                        href={`${BACKEND_URL}${resource.url}`}
+                        download={`${resource.title}.pdf`}
+                        target="_blank"
+                        rel="noreferrer"
+                        className={`${className} cursor-pointer`}
+                        data-testid={`resource-${index}`}
+                      >
+                        {content}
+                      </a>
+                    ) : (
+                      <div key={index} className={className} data-testid={`resource-${index}`}>
+                        {content}
                       </div>
-                    </div>
-                  ))}
+                    );
+                  })}
                 </div>
               </CardContent>
             </Card>
@@ -53,7 +53,13 @@ const LearnerRegistration = () => {
     setIsProcessing(true);
     
     try {
-      const response = await axios.post(`${API}/learners/login?email=${encodeURIComponent(loginEmail)}`);
+      // Send any session we still hold so the backend can reuse it
+      const existingSession = localStorage.getItem("learner_session");
+      const response = await axios.post(
+        `${API}/learners/login?email=${encodeURIComponent(loginEmail)}`,
+        null,
+        existingSession ? { headers: { "X-Learner-Session": existingSession } } : undefined
+      );
       
       // Store session info
       localStorage.setItem("learner_session", response.data.session_token);
@@ -0,0 +1,144 @@
+import os
+import requests
+import statistics
+import sys
+import time
+from datetime import datetime
+
+class FSO_API_Benchmark:
+    def __init__(self, base_url="https://projectnexus-3.preview.emergentagent.com/api", rounds=30):
+        self.base_url = base_url
+        self.rounds = rounds
+        self.session = requests.Session()
+        self.cookies = None
+        self.credentials = None
+
+    def login(self):
+        """Register and log in a throwaway PMO user"""
+        timestamp = datetime.now().strftime("%H%M%S%f")
+        self.credentials = {"username": f"benchpmo{timestamp}", "password": "BenchPass123!"}
+        self.session.post(f"{self.base_url}/auth/register", json={**self.credentials, "name": "Benchmark PMO"}, timeout=10)
+        response = self.session.post(f"{self.base_url}/auth/login", json=self.credentials, timeout=10)
+        if response.status_code != 200 or not response.cookies.get("session_token"):
+            return False
+        self.cookies = {"session_token": response.cookies.get("session_token")}
+        return True
+
+    def get(self, endpoint):
+        def call():
+            response = self.session.get(f"{self.base_url}/{endpoint}", cookies=self.cookies, timeout=10)
+            response.raise_for_status()
+            return len(response.content)
+        return call
+
+    def post(self, endpoint, data=None, params=None):
+        def call():
+            response = self.session.post(f"{self.base_url}/{endpoint}", json=data, params=params, timeout=10)
+            response.raise_for_status()
+            return len(response.content)
+        return call
+
+    def measure(self, name, calls):
+        """Time self.rounds repetitions of running all calls sequentially"""
+        durations, payload_bytes = [], 0
+        for call in calls:
+            call()  # warm-up
+        for _ in range(self.rounds):
+            total, payload_bytes = 0.0, 0
+            for call in calls:
+                started = time.perf_counter()
+                payload_bytes += call() or 0
+                total += time.perf_counter() - started
+            durations.append(total * 1000)
+        durations.sort()
+        result = {
+            "name": name,
+            "requests": len(calls),
+            "bytes": payload_bytes,
+            "mean_ms": statistics.mean(durations),
+            "p50_ms": durations[len(durations) // 2],
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        }
+        print(f"{name:<32} {result['requests']:>4} req  {result['bytes']:>8} B  "
+              f"mean {result['mean_ms']:8.1f} ms  p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms")
+        return result
+
+    def benchmark_cohort_comparison(self):
+        """Three per-cohort calls vs. the single $facet comparison endpoint"""
+        print("\n" + "="*60)
+        print("BENCHMARK: Cross-Cohort Comparison")
+        print("="*60)
+        baseline = self.measure("cohort/1 + cohort/2 + cohort/3", [self.get(f"dashboard/cohort/{i}") for i in (1, 2, 3)])
+        compare = self.measure("cohorts/compare", [self.get("dashboard/cohorts/compare")])
+        print(f"\nSpeed-up (mean): {baseline['mean_ms'] / compare['mean_ms']:.2f}x, "
+              f"payload: {compare['bytes']} B vs {baseline['bytes']} B")
+
+    def benchmark_login_paths(self):
+        """End-to-end latency of the PMO and learner login endpoints"""
+        print("\n" + "="*60)
+        print("BENCHMARK: Login Paths")
+        print("="*60)
+        email = f"bench.learner.{datetime.now().strftime('%H%M%S%f')}@example.com"
+        self.post("learners/register", data={"name": "Benchmark Learner", "email": email, "cohort": "Other"})()
+        self.measure("POST /auth/login", [self.post("auth/login", data=self.credentials)])
+        self.measure("POST /learners/login", [self.post("learners/login", params={"email": email})])
+
+    def benchmark_write_tiers(self, mongo_url, db_name):
+        """Driver-level latency of each write tier for the writes on the login paths.
+
+        w=0 returns as soon as the request is sent, so its figure is client-side only.
+        """
+        from pymongo import MongoClient
+        from pymongo.write_concern import WriteConcern
+
+        print("\n" + "="*60)
+        print("BENCHMARK: Write Concern Tiers")
+        print("="*60)
+        client = MongoClient(mongo_url)
+        scratch = client[db_name]["benchmark_write_tiers"]
+        tiers = [
+            ("majority", WriteConcern(w="majority")),
+            ("w=1", WriteConcern(w=1)),
+            ("w=0", WriteConcern(w=0))
+        ]
+        try:
+            scratch.insert_one({"id": "bench-learner"})
+            for label, concern in tiers:
+                collection = scratch.with_options(write_concern=concern)
+
+                def insert_session():
+                    collection.insert_one({"session_token": os.urandom(16).hex(), "type": "learner"})
+
+                def update_last_login():
+                    collection.update_one({"id": "bench-learner"}, {"$set": {"last_login": datetime.now().isoformat()}})
+
+                self.measure(f"session insert ({label})", [insert_session])
+                self.measure(f"last_login update ({label})", [update_last_login])
+        finally:
+            scratch.drop()
+            client.close()
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "https://projectnexus-3.preview.emergentagent.com/api"
+    print("="*60)
+    print("FSO PROJECT HUB - BACKEND BENCHMARKS")
+    print("="*60)
+    print(f"Benchmark started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Base URL: {base_url}")
+
+    benchmark = FSO_API_Benchmark(base_url)
+    if not benchmark.login():
+        print("❌ Could not log in a PMO user - aborting")
+        return 1
+
+    benchmark.benchmark_cohort_comparison()
+    benchmark.benchmark_login_paths()
+    if os.environ.get("MONGO_URL"):
+        # Same variables as the backend; points at the database under test
+        benchmark.benchmark_write_tiers(os.environ["MONGO_URL"], os.environ.get("DB_NAME", "fso_database"))
+    else:
+        print("\n⚠️  MONGO_URL not set - skipping write concern tier benchmark")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# server.py reads these at import; no database connection is made by these tests
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "fso_sketch_test")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import numpy as np
+from server import HLL_STANDARD_ERROR, hll_estimate, hll_registers, pack_registers, unpack_registers
+
+# ~99.7% of HyperLogLog estimates fall within three standard errors
+TOLERANCE = 3 * HLL_STANDARD_ERROR
+
+class FSO_Sketch_Tester:
+    """Active learner HyperLogLog sketches checked against exact distinct counts"""
+
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+        self.failed_tests = []
+
+    def check(self, name, exact, estimate):
+        self.tests_run += 1
+        error = (estimate - exact) / exact
+        if abs(error) <= TOLERANCE:
+            self.tests_passed += 1
+            print(f"✅ {name}: exact {exact}, estimate {estimate} ({error:+.2%})")
+        else:
+            print(f"❌ {name}: exact {exact}, estimate {estimate} ({error:+.2%}, tolerance ±{TOLERANCE:.2%})")
+            self.failed_tests.append(name)
+
+    def test_single_sketch_accuracy(self):
+        """Estimates across the linear counting and HyperLogLog ranges"""
+        print("\n" + "="*60)
+        print("TESTING: Single Sketch Accuracy")
+        print("="*60)
+        for count in (10, 100, 850, 5000, 20000, 100000):
+            learner_ids = [f"learner-{count}-{i}" for i in range(count)]
+            self.check(f"{count} learners", count, hll_estimate(hll_registers(learner_ids)))
+
+    def test_merged_week_accuracy(self):
+        """A week merged from per cohort, per day sketches, with learners active on several days"""
+        print("\n" + "="*60)
+        print("TESTING: Merged Weekly Sketches")
+        print("="*60)
+        rng = np.random.default_rng(7)
+        cohort_sizes = {"VET": 150, "First Nations": 100, "Other": 600}
+        week, active = [], {}
+        for cohort, size in cohort_sizes.items():
+            learners = [f"{cohort}-{i}" for i in range(size)]
+            active[cohort] = set()
+            cohort_days = []
+            for day in range(7):
+                today = [learner for learner in learners if rng.random() < 0.3]
+                active[cohort].update(today)
+                cohort_days.append(hll_registers(today))
+            merged = np.maximum.reduce(cohort_days)
+            self.check(f"{cohort} week", len(active[cohort]), hll_estimate(merged))
+            week.append(merged)
+        overall = np.maximum.reduce(week)
+        self.check("all cohorts week", len(set().union(*active.values())), hll_estimate(overall))
+
+        # Merging sketches must equal sketching the union directly
+        self.tests_run += 1
+        if np.array_equal(overall, hll_registers(set().union(*active.values()))):
+            self.tests_passed += 1
+            print("✅ merged sketch equals the sketch of the union")
+        else:
+            print("❌ merged sketch differs from the sketch of the union")
+            self.failed_tests.append("merge equals union")
+
+    def test_packed_round_trip(self):
+        """Stored (compressed) registers read back unchanged"""
+        print("\n" + "="*60)
+        print("TESTING: Sketch Storage")
+        print("="*60)
+        registers = hll_registers(f"learner-{i}" for i in range(300))
+        packed = pack_registers(registers)
+        self.tests_run += 1
+        if np.array_equal(unpack_registers(packed), registers):
+            self.tests_passed += 1
+            print(f"✅ {registers.nbytes} B of registers stored in {len(packed)} B")
+        else:
+            print("❌ registers changed in a storage round trip")
+            self.failed_tests.append("packed round trip")
+
+    def print_summary(self):
+        print("\n" + "="*60)
+        print(f"📊 SKETCH TEST SUMMARY: {self.tests_passed}/{self.tests_run} passed")
+        for name in self.failed_tests:
+            print(f"❌ {name}")
+        print("="*60)
+        return self.tests_passed == self.tests_run
+
+def main():
+    print("="*60)
+    print("FSO PROJECT HUB - ACTIVE LEARNER SKETCH ACCURACY")
+    print("="*60)
+    print(f"Test started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Relative standard error: {HLL_STANDARD_ERROR:.2%}, tolerance ±{TOLERANCE:.2%}")
+
+    tester = FSO_Sketch_Tester()
+    tester.test_single_sketch_accuracy()
+    tester.test_merged_week_accuracy()
+    tester.test_packed_round_trip()
+    return 0 if tester.print_summary() else 1
+
+if __name__ == "__main__":
+    sys.exit(main())